@@ -0,0 +1,137 @@
+/*
+This file contains the clientside callback functions, which run in the browser without a request to the server.
+They are registered in python via dash.ClientsideFunction(namespace='clientside', function_name=...).
+*/
+
+// node attributes, that are not shown in the node-info-box, only attributes in the csv are shown
+const NODE_INFO_SKIP_KEYS = new Set(['id', 'label', 'bg_front', 'bg_back', 'bg_split', 'timeStamp', 'bg_die', 'coin_ids_string']);
+const NODE_INFO_LIST_STYLE = {margin: 0, paddingLeft: '18px'};
+// delay of node-info-box updates, so sweeping over many nodes only renders the last one
+const NODE_INFO_DEBOUNCE_MS = 50;
+// hover waiting for its debounce delay, with its timer and promise resolve function
+let pendingNodeInfo = null;
+
+// generateImage configurations for the png export of both views
+const PNG_EXPORT_OPTIONS = {full: false, scale: 4, bg: 'white'};
+const PNG_EXPORT_COINS = {type: 'png', action: 'download', filename: 'coingraph_view', options: PNG_EXPORT_OPTIONS};
+const PNG_EXPORT_DIES = {type: 'png', action: 'download', filename: 'diesgraph_view', options: PNG_EXPORT_OPTIONS};
+
+/**
+ * Build node-info-box content for a node.
+ *
+ * @param {Object|null} data - Node data of the hovered over node.
+ * @returns {Object|string} A html.Div component showing the node label and a list of attributes or user instructions.
+ */
+function renderNodeInfo(data) {
+    if (!data) {
+        return 'Hover over a node to see details';
+    }
+
+    const label = 'label' in data ? data.label : 'untitled';
+    // build list of node attributes
+    const items = [];
+    for (const [k, v] of Object.entries(data)) {
+        if (NODE_INFO_SKIP_KEYS.has(k)) {
+            continue;
+        }
+        items.push({
+            namespace: 'dash_html_components',
+            type: 'Li',
+            props: {children: [
+                {namespace: 'dash_html_components', type: 'Strong', props: {children: `${k}: `}},
+                v === null ? 'None' : Array.isArray(v) ? v.join(', ') : String(v)
+            ]}
+        });
+    }
+    // display node label + list of node attributes
+    return {
+        namespace: 'dash_html_components',
+        type: 'Div',
+        props: {children: [
+            {namespace: 'dash_html_components', type: 'H4', props: {children: `Node: ${label}`}},
+            {namespace: 'dash_html_components', type: 'Ul', props: {children: items, style: NODE_INFO_LIST_STYLE}}
+        ]}
+    };
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    clientside: {
+        /**
+         * Update node-info-box when hovering over nodes. Rapid hovers are debounced,
+         * only the last hover within NODE_INFO_DEBOUNCE_MS gets rendered.
+         *
+         * @param {Object|null} dataCoin - Node data for hovered over node in coin view.
+         * @param {Object|null} dataDie - Node data for hovered over node in die view.
+         * @returns {Promise} Resolves to the node-info-box content or no_update, if a newer hover replaced this one.
+         */
+        displayNodeData: function (dataCoin, dataDie) {
+            // Use whichever view triggered callback, context is only valid synchronously
+            const trig = dash_clientside.callback_context.triggered_id;
+            let data;
+            if (trig === 'cy-dies') {
+                data = dataDie;
+            } else if (trig === 'cy-coins') {
+                data = dataCoin;
+            } else {
+                data = dataDie || dataCoin;
+            }
+
+            // a newer hover replaces the pending one
+            if (pendingNodeInfo) {
+                clearTimeout(pendingNodeInfo.timer);
+                pendingNodeInfo.resolve(window.dash_clientside.no_update);
+            }
+            return new Promise(resolve => {
+                const pending = {resolve: resolve};
+                pending.timer = setTimeout(() => {
+                    pendingNodeInfo = null;
+                    resolve(renderNodeInfo(data));
+                }, NODE_INFO_DEBOUNCE_MS);
+                pendingNodeInfo = pending;
+            });
+        },
+
+        /**
+         * Set the layout of the coin and die cytoscape instances.
+         *
+         * @param {string} selectedLayout - Requested layout from layout-selector ui component.
+         * @param {string} activeView - Currently selected view from the graph view selector.
+         * @param {Array} autoLayoutToggle - List contains 'on' if checklist is clicked, else empty.
+         * @param {Object} layoutConfigs - Mapping of layout name to layout configuration, built by layouts.build_layout.
+         * @returns {Array} Layout configuration for the coin and die cytoscape instance, no_update for the inactive view.
+         */
+        setLayout: function (selectedLayout, activeView, autoLayoutToggle, layoutConfigs) {
+            const autoEnabled = (autoLayoutToggle || []).includes('on');
+            const trig = dash_clientside.callback_context.triggered_id;
+
+            // If auto-layout is off, only change layout on layout-selector. Nothing to update otherwise
+            if (!autoEnabled && (trig !== 'layout-selector' || (activeView !== 'coins' && activeView !== 'dies'))) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+
+            const layout = (layoutConfigs || {})[selectedLayout] || {name: selectedLayout, fit: true, padding: 30};
+            const noUpdate = window.dash_clientside.no_update;
+            // Apply layout only to the currently active view
+            if (activeView === 'coins') {
+                return [layout, noUpdate];
+            }
+            return [noUpdate, layout];
+        },
+
+        /**
+         * Triggers PNG export of the current view.
+         *
+         * @param {number|null} nClicks - Number of clicks on the export button.
+         * @param {string} view - Currently selected view from the graph view selector.
+         * @returns {Array} generateImage configuration for the active view's cytoscape instance and no_update for the other one.
+         */
+        exportPng: function (nClicks, view) {
+            const noUpdate = window.dash_clientside.no_update;
+            // new object on every click, so cytoscape sees a changed prop and exports again
+            if (view === 'dies') {
+                return [noUpdate, Object.assign({}, PNG_EXPORT_DIES)];
+            }
+            return [Object.assign({}, PNG_EXPORT_COINS), noUpdate];
+        }
+    }
+});
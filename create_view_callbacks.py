@@ -3,11 +3,11 @@ This module is responsible for creating the first visualizations based on the ch
 """
 
 from dash import Input, Output, State, ctx, no_update, dcc, html
-import networkx as nx
-import base64, csv, io
+import base64
+from collections import defaultdict
 
-from csv_handler import load_graph_from_csv, normalize_key
-from graph_handler import add_edges_by_mode, create_dies_graph, nx_to_elements, enrich_images
+from csv_handler import load_graph_from_csv, resolve_column_keys, csv_exceeds_rows, truncate_csv_rows
+from graph_handler import add_edges_by_mode, create_dies_graph, coin_node_elements, graph_to_store_and_elements
 
 
 def register_create_view_callbacks(app):
@@ -65,20 +65,12 @@ def register_create_view_callbacks(app):
             encoded = base64.b64encode(raw).decode('ascii')
             contents = f"data:text/csv;base64,{encoded}"
 
-        # csv was uploaded or test csv selected -> decode contents
+        # csv was uploaded or test csv selected -> check size of contents
         if trig in ('upload-data', 'test-dive-button') and contents:
             content_type, content_string = contents.split(',', 1)
-            decoded = base64.b64decode(content_string)
-            text = decoded.decode('latin-1', errors='ignore')
-
-            #count rows
-            f = io.StringIO(text)
-            reader = csv.reader(f)
-            header = next(reader, None)
-            n_rows = sum(1 for _ in reader)
 
-            # if uploaded csv too big, stash csv and show dialogue box
-            if n_rows <= 100:
+            # if uploaded csv too big, stash csv and show dialogue box. Only decodes until 100 rows are exceeded
+            if not csv_exceeds_rows(content_string, 100):
                 return contents, None, False, upload_signal + 1
             else:
                 return None, contents, True, upload_signal
@@ -96,24 +88,8 @@ def register_create_view_callbacks(app):
             # decode pending csv
             content_type, content_string = pending.split(',', 1)
             decoded = base64.b64decode(content_string)
-            text = decoded.decode('latin-1', errors='ignore')
-            # only keep first 100 lines
-            fin = io.StringIO(text)
-            reader = csv.reader(fin)
-            header = next(reader, [])
-            rows = []
-            for i, row in enumerate(reader):
-                if i >= 100:
-                    break
-                rows.append(row)
-            # re-encode the reduced csv 
-            fout = io.StringIO()
-            w = csv.writer(fout, lineterminator='\n')
-            if header:
-                w.writerow(header)
-            w.writerows(rows)
-            reduced_text = fout.getvalue().encode('latin-1', errors='ignore')
-            reduced_b64 = base64.b64encode(reduced_text).decode('ascii')
+            # only keep header and first 100 lines, re-encode only the reduced bytes
+            reduced_b64 = base64.b64encode(truncate_csv_rows(decoded, 100)).decode('ascii')
             reduced_contents = f"data:text/csv;base64,{reduced_b64}"
 
             return reduced_contents, None, False, upload_signal + 1
@@ -133,6 +109,7 @@ def register_create_view_callbacks(app):
         Output({'type': 'color-dropdown', 'index': 'red'}, 'value'),
         Output({'type': 'color-dropdown', 'index': 'blue'}, 'value'),
         Output({'type': 'color-dropdown', 'index': 'green'}, 'value'),
+        Output('combinations-store', 'data'),
         Input('upload-signal', 'data'),
         State('csv-approved', 'data'),
         State('front-column', 'value'),
@@ -185,50 +162,54 @@ def register_create_view_callbacks(app):
             Contains dropdown selection for blue coloring.
         list of dict  
             Contains dropdown selection for green coloring.
+        list of str
+            Sorted attribute=value combinations, used for custom color dropdowns.
         """
 
         if not contents:
-            return (no_update, no_update, no_update, no_update, [], [], [], [], None, None, None)
+            return (no_update, no_update, no_update, no_update, [], [], [], [], None, None, None, [])
         
         content_type, content_string = contents.split(',')
         decoded = base64.b64decode(content_string)
         coins_graph = load_graph_from_csv(decoded)
 
         # Normalize the user-provided (or default) column names
-        front_key = normalize_key(front_column or "front die")
-        back_key = normalize_key(back_column or "back die")
-        front_url_key = normalize_key(front_url_column or "front img")
-        back_url_key = normalize_key(back_url_column or "back img")
+        front_key, back_key, front_url_key, back_url_key = resolve_column_keys(
+            front_column, back_column, front_url_column, back_url_column)
 
         # build edges according to selected mode
         add_edges_by_mode(coins_graph, front_key, back_key, edge_mode)
 
         # maps each attribute to all its values like {attribute -> set(values)} for filter dropdown
-        attribute_values = dict()
-        # set of  all "attribute=value" strings for color dropdown
-        combinations = set()
+        attribute_values = defaultdict(set)
         for _, data in coins_graph.nodes(data=True):
             for attribute, value in data.items():
                 if value is not None:
-                    attribute_values.setdefault(attribute, set()).add(value)
-                    combinations.add(f"{attribute}={value}")
+                    attribute_values[attribute].add(value)
+        # all "attribute=value" strings for color dropdown, only formatted once per unique pair
+        combinations = sorted(f"{attribute}={value}" for attribute, values in attribute_values.items() for value in values)
 
+        # sorted dropdown options per attribute, csv values are already str
+        attr_options = {
+            attr: [{'label': val, 'value': val} for val in map(str, sorted(vals))]
+            for attr, vals in attribute_values.items()
+        }
         # build filter dropdown for every attribute
         filter_ui = [
             html.Div([
-                html.Label(f"{attr}"),
+                html.Label(attr),
                 dcc.Dropdown(
                     id={'type': 'filter-dropdown', 'index': attr},
-                    options=[{'label': str(val), 'value': str(val)} for val in sorted(vals)],
+                    options=opts,
                     multi=True,
                     searchable=True,
                     placeholder=f"Search {attr} value"
                 )
             ])
-            for attr, vals in attribute_values.items()
+            for attr, opts in attr_options.items()
         ]
         # build options for color dropdowns, expects [{'label':displayed text, 'value':returned value}]
-        options = [{'label': c, 'value': c} for c in sorted(combinations)]
+        options = [{'label': c, 'value': c} for c in combinations]
 
         # build die-graph with input columns
         dies_graph, _ = create_dies_graph(
@@ -236,15 +217,14 @@ def register_create_view_callbacks(app):
             front_url_col=front_url_key, back_url_col=back_url_key
             )
 
-        # cytoscape elements for graphs
-        coins_base_elements = nx_to_elements(coins_graph)             # base (no images)
-        dies_elements = nx_to_elements(dies_graph)
-
-        coins_with_images_elements = enrich_images(coins_graph, coins_base_elements, front_url_key, back_url_key)
+        # store data and cytoscape elements for graphs, coin node elements with images come from cache
+        coins_store, coins_with_images_elements = graph_to_store_and_elements(
+            coins_graph, coin_node_elements(coins_graph, front_url_key, back_url_key))
+        dies_store, dies_elements = graph_to_store_and_elements(dies_graph)
 
         return (
-            nx.readwrite.json_graph.node_link_data(coins_graph),
-            nx.readwrite.json_graph.node_link_data(dies_graph),
+            coins_store,
+            dies_store,
             coins_with_images_elements,
             dies_elements,
             filter_ui,
@@ -253,6 +233,7 @@ def register_create_view_callbacks(app):
             options,
             None,
             None,
-            None
+            None,
+            combinations
         )
 
@@ -2,18 +2,33 @@
 This module handles all interaction with the uploaded csv, which includes building a coin graph based on csv.
 """
 
+import base64
 import csv
+import codecs
+import sys
 import networkx as nx
 import io
 import unicodedata
 import re
+from functools import lru_cache
+from uuid import uuid4
 
 from proxy import proxify
 
 
+# transliteration of german umlauts and sharp s
+_UMLAUT_TABLE = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "Ä": "Ae", "Ö": "Oe", "Ü": "Ue", "ß": "ss"})
+# removes all combining characters (diacritics) after NFKD decomposition
+_COMBINING_TABLE = {c: None for c in range(sys.maxunicode + 1) if unicodedata.combining(chr(c))}
+# maps every ASCII character, that is not a letter or digit, to an underscore
+_NON_ALNUM_TABLE = str.maketrans({chr(c): "_" for c in range(128) if not chr(c).isalnum()})
+
+
+# column names repeat a lot, so each one only gets normalized once
+@lru_cache(maxsize=4096)
 def normalize_key(key):
     """
-    function normalizes a string.
+    function normalizes a string. Also it caches function results.
 
     Parameters
     ----------
@@ -29,19 +44,50 @@ def normalize_key(key):
     if key is None:
         return ""
     key = str(key).strip()
-    key = (key.replace("ä","ae").replace("ö","oe").replace("ü","ue")
-           .replace("Ä","Ae").replace("Ö","Oe").replace("Ü","Ue")
-           .replace("ß","ss"))
-    # strip diacritics, for other languages
-    key = unicodedata.normalize("NFKD", key)
-    key = "".join(ch for ch in key if not unicodedata.combining(ch))
-    # keep alnum only, collapse to underscores
-    key = re.sub(r"[^a-zA-Z0-9]+", "_", key)
-    # collapse multiple underscores from ends
-    key = re.sub(r"_+", "_", key).strip("_")
+    key = key.translate(_UMLAUT_TABLE)
+    # strip diacritics, for other languages. ASCII strings have none
+    if not key.isascii():
+        key = unicodedata.normalize("NFKD", key).translate(_COMBINING_TABLE)
+    # keep alnum only, remaining non-ASCII characters become "?" first and then underscores
+    key = key.encode("ascii", "replace").decode("ascii").translate(_NON_ALNUM_TABLE)
+    # collapse multiple underscores and strip them from ends
+    while "__" in key:
+        key = key.replace("__", "_")
+    key = key.strip("_")
     return key or "col"   # fallback if string becomes empty
 
 
+# same column inputs are resolved on every callback
+@lru_cache(maxsize=128)
+def resolve_column_keys(front_column, back_column, front_url_column, back_url_column):
+    """
+    Normalize the user-provided (or default) column names of dies and images to safe keys. Also it caches function results.
+
+    Parameters
+    ----------
+    front_column : str or None
+        Text in 'front-column' input field, defaults to "front die".
+    back_column : str or None
+        Text in 'back-column' input field, defaults to "back die".
+    front_url_column : str or None
+        Text in 'front-url-column' input field, defaults to "front img".
+    back_url_column : str or None
+        Text in 'back-url-column' input field, defaults to "back img".
+
+    Returns
+    -------
+    tuple of str
+        Safe keys of front die, back die, front image and back image column.
+    """
+
+    return (
+        normalize_key(front_column or "front die"),
+        normalize_key(back_column or "back die"),
+        normalize_key(front_url_column or "front img"),
+        normalize_key(back_url_column or "back img"),
+    )
+
+
 def _unique_key_map(fieldnames):
     """
     Map raw headers to unique safe keys.
@@ -57,18 +103,114 @@ def _unique_key_map(fieldnames):
         Mapping from original header names, ASCII-only keys. Also adds suffixes when normalization resulted in duplicates.
     """
 
-    key_map = {}
-    seen = {}
-    for name in fieldnames or []:
+    fieldnames = tuple(fieldnames or [])
+    return dict(zip(fieldnames, _unique_keys(fieldnames)))
+
+
+# same csv schema is often loaded repeatedly, so cache keys per header
+@lru_cache(maxsize=128)
+def _unique_keys(fieldnames):
+    """
+    Normalize raw headers to unique safe keys. Also it caches function results.
+
+    Parameters
+    ----------
+    fieldnames : tuple of str
+        contains raw header names.
+
+    Returns
+    -------
+    tuple of str
+        Safe key for every header in the same order. Adds suffixes when normalization resulted in duplicates.
+    """
+
+    keys = []
+    seen = set()
+    for name in fieldnames:
         base = normalize_key(name)
         safe = base
         i = 2
         while safe in seen:
             safe = f"{base}_{i}"
             i += 1
-        key_map[name] = safe
-        seen[safe] = True
-    return key_map
+        keys.append(safe)
+        seen.add(safe)
+    return tuple(keys)
+
+
+def _csv_encoding(head):
+    """
+    Pick encoding for csv data based on its first bytes.
+
+    Parameters
+    ----------
+    head : bytes
+        First bytes of the csv data.
+
+    Returns
+    -------
+    str
+        'utf-8-sig' if data starts with UTF-8 BOM (the BOM gets skipped), else 'latin-1'.
+    """
+
+    return 'utf-8-sig' if head.startswith(codecs.BOM_UTF8) else 'latin-1'
+
+
+def _open_csv(csv_path_or_buffer):
+    """
+    Open csv file or buffer as text file for the csv module.
+
+    Parameters
+    ----------
+    csv_path_or_buffer : str or bytes
+        Path to csv file or bytes object containing the csv data.
+
+    Returns
+    -------
+    io.TextIOWrapper
+        Text file decoding the csv data lazily while it is read.
+    """
+
+    if isinstance(csv_path_or_buffer, str):
+        # open once in binary mode, peeking at the buffer does not consume the BOM check bytes
+        binfile = open(csv_path_or_buffer, 'rb')
+        encoding = _csv_encoding(binfile.peek(len(codecs.BOM_UTF8))[:len(codecs.BOM_UTF8)])
+    else:
+        # decode lazily while csv reads, instead of decoding the whole buffer upfront
+        binfile = io.BytesIO(csv_path_or_buffer)
+        encoding = _csv_encoding(csv_path_or_buffer[:len(codecs.BOM_UTF8)])
+    return io.TextIOWrapper(binfile, newline='', encoding=encoding, errors='replace')
+
+
+def _iter_nodes(reader, safe_keys, node_idx):
+    """
+    Generator turning csv rows into nodes for G.add_nodes_from.
+
+    Parameters
+    ----------
+    reader : csv.reader
+        Reader positioned after the header row.
+    safe_keys : list of str
+        Safe key for every column, in column order.
+    node_idx : int or None
+        Position of the id column, None if there is no id column.
+
+    Yields
+    ------
+    tuple of (str, dict)
+        Node id and node attributes of every non blank row.
+    """
+
+    n_cols = len(safe_keys)
+    # filter(None, ...) skips blank lines without a python level check per row
+    for idx, row in enumerate(filter(None, reader), start=1):
+        # missing fields in short rows become None, extra fields are dropped
+        if len(row) < n_cols:
+            row += [None] * (n_cols - len(row))
+        # Node id: value of id column if present, else row number. Both are already str
+        node_id = (row[node_idx] if node_idx is not None else None) or str(idx)
+        # Build a safe-keyed row
+        yield node_id, dict(zip(safe_keys, row))
 
 
 def load_graph_from_csv(csv_path_or_buffer, node_id_col=None):
@@ -92,37 +234,151 @@ def load_graph_from_csv(csv_path_or_buffer, node_id_col=None):
 
     G = nx.Graph()
 
-    # Open file or buffer
-    if isinstance(csv_path_or_buffer, str):
-        csvfile = open(csv_path_or_buffer, newline='', encoding='latin-1')
-    else:
-        csvfile = io.StringIO(csv_path_or_buffer.decode('latin-1'))
+    with _open_csv(csv_path_or_buffer) as csvfile:
+        reader = csv.reader(csvfile)
+        fieldnames = next(reader, None) or []
+        key_map = _unique_key_map(fieldnames)                       # raw -> safe
+        safe_keys = [sys.intern(key_map[name]) for name in fieldnames]   # safe key per column, shared by all node dicts
+
+        # Work out which column is the node id (accept raw or safe)
+        if node_id_col is None and fieldnames:
+            node_raw = fieldnames[0]
+        elif node_id_col in fieldnames:
+            node_raw = node_id_col
+        else:
+            # safe key given, look up its raw header
+            node_raw = next((raw for raw, safe in key_map.items() if safe == node_id_col), node_id_col)
+        node_safe = key_map[node_raw] if node_raw in key_map else normalize_key(node_raw or "id")
+        # resolve id column position once, later columns win on duplicate keys like in the node attributes
+        node_idx = {key: i for i, key in enumerate(safe_keys)}.get(node_safe)
+
+        # add all rows as nodes in one batch
+        G.add_nodes_from(_iter_nodes(reader, safe_keys, node_idx))
 
-    reader = csv.DictReader(csvfile)
-    fieldnames = reader.fieldnames or []
-    key_map = _unique_key_map(fieldnames)                       # raw -> safe
-    inv_map = {v: k for k, v in key_map.items()}                # safe -> raw
+    # Stash mappings for the UI
+    G.graph['key_map'] = key_map
+    G.graph['inv_key_map'] = {v: k for k, v in key_map.items()}   # safe -> raw
+    # identifies the nodes of this csv, they stay the same when edges get rebuilt
+    G.graph['nodes_key'] = uuid4().hex
+    return G
 
-    # Work out which column is the node id (accept raw or safe)
-    if node_id_col is None and fieldnames:
-        node_raw = fieldnames[0]
-    else:
-        node_raw = node_id_col if node_id_col in fieldnames else inv_map.get(node_id_col, node_id_col)
-    node_safe = key_map.get(node_raw, normalize_key(node_raw or "id"))
 
-    for idx, row in enumerate(reader, start=1):
-        # Build a safe-keyed row
-        safe_row = { key_map.get(k, normalize_key(k)): v for k, v in row.items() }
-        # Node id: prefer original raw key value if present, else safe
-        node_id = row.get(node_raw) or safe_row.get(node_safe) or str(idx)
-        G.add_node(str(node_id), **safe_row)
+def _count_row_breaks(data, line_break, in_quotes):
+    """
+    Counts line breaks, that end a csv row. Line breaks inside quoted fields are skipped,
+    a field is quoted while an odd number of quote characters came before it.
+
+    Parameters
+    ----------
+    data : bytes
+        Raw csv data, may be a chunk of a larger csv.
+    line_break : bytes
+        Line break to count, either b"\n" or b"\r".
+    in_quotes : bool
+        True if data starts inside a quoted field.
 
-    csvfile.close()
+    Returns
+    -------
+    int
+        Number of line breaks outside of quoted fields.
+    """
 
-    # Stash mappings for the UI
-    G.graph['key_map'] = key_map
-    G.graph['inv_key_map'] = inv_map
-    return G
+    count = 0
+    pos = 0
+    while True:
+        end = data.find(line_break, pos)
+        if end == -1:
+            return count
+        if data.count(b'"', pos, end) % 2:
+            in_quotes = not in_quotes
+        if not in_quotes:
+            count += 1
+        pos = end + 1
+
+
+def csv_exceeds_rows(b64_data, max_rows, chunk_size=65536):
+    """
+    Checks if base64 encoded csv data has more than max_rows rows by counting line breaks, instead of parsing it.
+    The data is decoded chunk by chunk and counting stops as soon as the limit is exceeded.
+    Line breaks inside quoted fields are only looked at, if the data contains quotes.
+
+    Parameters
+    ----------
+    b64_data : str
+        Base64 encoded csv data including header.
+    max_rows : int
+        Maximum number of rows without the header.
+    chunk_size : int
+        Number of base64 characters decoded at once, must be a multiple of 4.
+
+    Returns
+    -------
+    bool
+        True if csv has more than max_rows rows, else False.
+    """
+
+    n_lf = 0
+    n_cr = 0
+    in_quotes = False
+    last_byte = b""
+    for start in range(0, len(b64_data), chunk_size):
+        chunk = base64.b64decode(b64_data[start:start + chunk_size])
+        # plain byte count, unless a quoted field may contain line breaks
+        if in_quotes or b'"' in chunk:
+            n_lf += _count_row_breaks(chunk, b"\n", in_quotes)
+            n_cr += _count_row_breaks(chunk, b"\r", in_quotes)
+            in_quotes ^= chunk.count(b'"') % 2 == 1
+        else:
+            n_lf += chunk.count(b"\n")
+            n_cr += chunk.count(b"\r")
+        # header line and more than max_rows lines, no need to decode the rest
+        if n_lf > max_rows + 1:
+            return True
+        last_byte = chunk[-1:] or last_byte
+
+    # old mac line endings only use carriage returns
+    line_break, n_lines = (b"\n", n_lf) if n_lf else (b"\r", n_cr)
+    # last line without line break
+    if last_byte and last_byte != line_break:
+        n_lines += 1
+    return n_lines - 1 > max_rows
+
+
+def truncate_csv_rows(data, max_rows):
+    """
+    Cuts raw csv bytes after the header and the first max_rows rows, without parsing the csv.
+    Line breaks inside quoted fields don't end a row.
+
+    Parameters
+    ----------
+    data : bytes
+        Raw csv data including header.
+    max_rows : int
+        Number of rows to keep after the header.
+
+    Returns
+    -------
+    bytes
+        Raw csv data of header and first max_rows rows, including their line breaks.
+    """
+
+    line_break = b"\n" if b"\n" in data else b"\r"
+    # quote state only needs to be tracked, if there are quotes at all
+    has_quotes = b'"' in data
+    in_quotes = False
+    pos = 0
+    n_rows = 0
+    # find end of header line plus max_rows lines
+    while n_rows < max_rows + 1:
+        end = data.find(line_break, pos)
+        if end == -1:
+            return data
+        if has_quotes and data.count(b'"', pos, end) % 2:
+            in_quotes = not in_quotes
+        if not in_quotes:
+            n_rows += 1
+        pos = end + 1
+    return data[:pos]
 
 
 def is_url(potential_url):
@@ -177,11 +433,33 @@ def bg_url_from_csv_value(raw_val):
         A proxy route if raw_val was url, modified relative path if it was a relative path or None if it was empty string.
     """
     
+    # empty cells are common and never reach the cache
     if not raw_val:
         return None
+    return _bg_url_from_value(raw_val)
+
+
+# many coins share the same image value, e.g. die images, so each value only gets converted once
+@lru_cache(maxsize=16384)
+def _bg_url_from_value(raw_val):
+    """
+    Converts a non empty csv value into a usuable url for background-image, see bg_url_from_csv_value.
+    Also it caches function results.
+
+    Parameters
+    ----------
+    raw_val : str
+        Raw value from a csv cell. Should be a url or relative file path.
+
+    Returns
+    -------
+    str
+        A proxy route if raw_val was url, modified relative path if it was a relative path or None if it was only whitespace.
+    """
+
     path = str(raw_val).strip()
     if not path:
         return None
     if is_url(path):
         return proxify(path)               # external URL through Proxy
-    return "/assets/" + norm_path(path)    # relative paths in assets
\ No newline at end of file
+    return "/assets/" + norm_path(path)    # relative paths in assets
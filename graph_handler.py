@@ -3,11 +3,105 @@ This module handles all interaction with the graphstructures and related helper
 """
 
 import networkx as nx
-from urllib.parse import urlencode
+from collections import Counter, OrderedDict, defaultdict
+from functools import lru_cache
+from itertools import combinations
+from threading import Lock
+from urllib.parse import quote_plus
+from uuid import uuid4
 
 from csv_handler import bg_url_from_csv_value
 
 
+# parsed graphs of the graph stores, so callbacks don't rebuild them from json on every fire
+GRAPH_CACHE_SIZE = 16
+_graph_cache = OrderedDict()
+# cytoscape node elements of coin-graphs, see coin_node_elements
+_node_elements_cache = OrderedDict()
+# attribute value -> node ids index of coin-graphs, see attribute_index
+_attribute_index_cache = OrderedDict()
+# die-graphs per coin-graph and hidden coins/dies, see cached_dies_graph
+_dies_graph_cache = OrderedDict()
+# connected components of stored graphs without hidden nodes, see cached_connected_components
+_components_cache = OrderedDict()
+_graph_cache_lock = Lock()
+# merged front/back preview image of a coin, see enrich_images
+_SPLIT_URL = "/merge_split?w=200&h=200&front={front}&back={back}"
+
+
+def _cache_put(cache, key, value):
+    """
+    Insert value into one of the module caches and drop least recently used entries above GRAPH_CACHE_SIZE.
+
+    Parameters
+    ----------
+    cache : OrderedDict
+        Cache to insert into.
+    key : hashable
+        Cache key.
+    value : object
+        Value to cache.
+    """
+
+    with _graph_cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > GRAPH_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def _cache_graph(G):
+    """
+    Keep graph cached server side for its dcc.Store.
+    A new store key is written into the graph attributes, which identifies the cached graph.
+
+    Parameters
+    ----------
+    G : nx.Graph
+        NetworkX graph representing either coin-graph or die-graph.
+
+    Returns
+    -------
+    str
+        Store key of the cached graph.
+    """
+
+    key = uuid4().hex
+    G.graph['store_key'] = key
+    _cache_put(_graph_cache, key, G)
+    return key
+
+
+def graph_from_store(graph_data):
+    """
+    Get graph from dcc.Store data. Uses the cached graph if possible, else the graph gets rebuilt from the
+    node-link data (e.g. after a restart or when another worker created the store) and cached.
+    The returned graph is shared between callbacks, so it must not be modified. Use a copy for that.
+
+    Parameters
+    ----------
+    graph_data : dict
+        Node-link data of a graph, created by graph_to_store_and_elements.
+
+    Returns
+    -------
+    nx.Graph
+        NetworkX graph representing either coin-graph or die-graph.
+    """
+
+    key = graph_data.get('graph', {}).get('store_key')
+    with _graph_cache_lock:
+        G = _graph_cache.get(key)
+        if G is not None:
+            _graph_cache.move_to_end(key)
+            return G
+
+    G = nx.readwrite.json_graph.node_link_graph(graph_data)
+    if key:
+        _cache_put(_graph_cache, key, G)
+    return G
+
+
 
 def remove_duplicate_dies(dies):
     """
@@ -24,17 +118,88 @@ def remove_duplicate_dies(dies):
         List of unique die dictionaries, with keys id and typ.
     """
 
-    seen = {}
+    seen = set()
+    unique_dies = []
     for die in dies:
         key = (str(die.get("id")), die.get("typ"))
-        seen[key] = {"id": key[0], "typ": key[1]}
-    return list(seen.values())
+        # only build die dict for first occurrence
+        if key not in seen:
+            seen.add(key)
+            unique_dies.append({"id": key[0], "typ": key[1]})
+    return unique_dies
+
+
+def _add_group_edges(G, attr, labeled_groups):
+    """
+    Adds an edge between all nodes within the same group.
+
+    Parameters
+    ----------
+    G : nx.Graph
+        NetworkX graph contains coin-graph structure.
+    attr : str
+        Value of attr edge attribute, describes which dies are shared.
+    labeled_groups : iterable of tuple of (str, list)
+        Edge label and node ids of every group.
+    """
+
+    edges = []
+    for label, ids in labeled_groups:
+        edge_attributes = {'attr': attr, 'label': label}
+        edges.extend((u, v, edge_attributes) for u, v in combinations(ids, 2))
+    G.add_edges_from(edges)
+
+
+def _add_edges_front(G, front_key, back_key):
+    """
+    Adds edges between coins with the same front die, see add_edges_by_mode.
+    """
+
+    groups = defaultdict(list)
+    for node_id, node_dict in G.nodes(data=True):
+        front = str(node_dict.get(front_key, "")).strip()
+        if front:
+            groups[front].append(node_id)
+    _add_group_edges(G, 'same_front', groups.items())
+
+
+def _add_edges_back(G, front_key, back_key):
+    """
+    Adds edges between coins with the same back die, see add_edges_by_mode.
+    """
+
+    groups = defaultdict(list)
+    for node_id, node_dict in G.nodes(data=True):
+        back = str(node_dict.get(back_key, "")).strip()
+        if back:
+            groups[back].append(node_id)
+    _add_group_edges(G, 'same_back', groups.items())
+
+
+def _add_edges_both(G, front_key, back_key):
+    """
+    Adds edges between coins with the same front and back die, see add_edges_by_mode.
+    """
+
+    groups = defaultdict(list)
+    for node_id, node_dict in G.nodes(data=True):
+        front = str(node_dict.get(front_key, "")).strip()
+        if not front:
+            continue
+        back = str(node_dict.get(back_key, "")).strip()
+        if back:
+            groups[(front, back)].append(node_id)
+    _add_group_edges(G, 'same_front_back', ((front + '/' + back, ids) for (front, back), ids in groups.items()))
+
+
+# edge building function for every edge mode
+_EDGE_MODE_FUNCTIONS = {'front': _add_edges_front, 'back': _add_edges_back, 'both': _add_edges_both}
 
 
 def add_edges_by_mode(G, front_key, back_key, mode = 'both'):
     """
-    Adds edges in coin-graph based on selected edge mode. Iterates over all node pairs and depending on
-    on edge mode, checks the relevant front die and/or back die attributes, if they match it adds an edge.
+    Adds edges in coin-graph based on selected edge mode. Groups nodes by their front die and/or back die
+    attributes depending on edge mode and adds an edge between all nodes within the same group.
 
     Parameters
     ----------
@@ -53,28 +218,10 @@ def add_edges_by_mode(G, front_key, back_key, mode = 'both'):
         This fuction modifies the graph in place.
     """
 
-    # Each item is (node id, node attributes dict)
-    nodes = list(G.nodes(data=True))
-    # compare every node pair 
-    for i in range(len(nodes) - 1):
-        u_id, u_dict = nodes[i]    
-        # extract relevant attributes from node u
-        front_u = str(u_dict.get(front_key, "")).strip()
-        back_u = str(u_dict.get(back_key, "")).strip()
-
-        for j in range(i + 1, len(nodes)):
-            v_id, v_dict = nodes[j]
-            # extract relevant attributes from node v
-            front_v = str(v_dict.get(front_key, "")).strip()
-            back_v = str(v_dict.get(back_key, "")).strip()
-            
-            # add edge between nodes, if attribute from associated mode matches
-            if mode == 'front' and front_u and front_u == front_v:
-                G.add_edge(u_id, v_id, attr='same_front', label=front_u)
-            elif mode == 'back' and back_u and back_u == back_v:
-                G.add_edge(u_id, v_id, attr='same_back', label=back_u)
-            elif mode == 'both' and front_u and back_u and front_u == front_v and back_u == back_v:
-                G.add_edge(u_id, v_id, attr='same_front_back', label=(front_u + '/' + back_v))
+    # pick mode specific function once, instead of checking the mode for every node
+    add_edges = _EDGE_MODE_FUNCTIONS.get(mode)
+    if add_edges:
+        add_edges(G, front_key, back_key)
 
 
 def create_dies_graph(coin_graph, front_col, back_col, hidden_coins=None, hidden_dies=None, front_url_col=None, back_url_col=None):
@@ -113,7 +260,8 @@ def create_dies_graph(coin_graph, front_col, back_col, hidden_coins=None, hidden
     die_graph = nx.Graph()
     skip_coins = set(hidden_coins or [])
     skip_dies = set(hidden_dies)
-    max_edge_weight = 0
+    # count coins per (front die, back die) pair, these become the weighted edges
+    edge_weights = Counter()
     # go through all nodes in coin_graph
     for node_id, data in coin_graph.nodes(data=True):
         # ignore hidden coins
@@ -128,8 +276,8 @@ def create_dies_graph(coin_graph, front_col, back_col, hidden_coins=None, hidden
 
         if not skip_front_die:
             if front_die not in die_graph:
-                die_graph.add_node(front_die, typ=front_col, coin_ids=set())
-            die_graph.nodes[front_die]["coin_ids"].add(coin_id)
+                die_graph.add_node(front_die, typ=front_col, coin_ids=[])
+            die_graph.nodes[front_die]["coin_ids"].append(coin_id)
             # assign image once if available
             if front_url_col and data.get(front_url_col) and "bg_die" not in die_graph.nodes[front_die]:
                 bg = bg_url_from_csv_value(data.get(front_url_col))
@@ -138,66 +286,361 @@ def create_dies_graph(coin_graph, front_col, back_col, hidden_coins=None, hidden
 
         if not skip_back_die:
             if back_die not in die_graph:
-                die_graph.add_node(back_die, typ=back_col, coin_ids=set())
-            die_graph.nodes[back_die]["coin_ids"].add(coin_id)
+                die_graph.add_node(back_die, typ=back_col, coin_ids=[])
+            # coin ids are unique, only a coin with the same die on both sides would be added twice
+            if skip_front_die or back_die != front_die:
+                die_graph.nodes[back_die]["coin_ids"].append(coin_id)
             # assign image once if available
             if back_url_col and data.get(back_url_col) and "bg_die" not in die_graph.nodes[back_die]:
                 bg = bg_url_from_csv_value(data.get(back_url_col))
                 if bg:
                     die_graph.nodes[back_die]["bg_die"] = bg
 
-        # connect front <-> back with weight
+        # count front <-> back connection
         if not skip_front_die and not skip_back_die:
-            if die_graph.has_edge(front_die, back_die):
-                die_graph[front_die][back_die]['weight'] += 1
-            else:
-                die_graph.add_edge(front_die, back_die, weight=1)
-            # update max edge weight
-            if die_graph[front_die][back_die]['weight'] > max_edge_weight:
-                max_edge_weight = die_graph[front_die][back_die]['weight']
-
-    for n in die_graph.nodes:
-        ids = sorted(str(x) for x in die_graph.nodes[n]["coin_ids"])
-        die_graph.nodes[n]["coin_ids"] = ids
-        die_graph.nodes[n]["coin_ids_string"] = "," + ",".join(sorted(ids)) + ","
+            # graph is undirected, so a reversed pair counts for the same edge
+            pair = (back_die, front_die) if (back_die, front_die) in edge_weights else (front_die, back_die)
+            edge_weights[pair] += 1
+
+    # connect front <-> back with weight in one batch
+    die_graph.add_weighted_edges_from((u, v, weight) for (u, v), weight in edge_weights.items())
+    max_edge_weight = max(edge_weights.values(), default=0)
+
+    # coin ids are already collected in csv order, no sorting needed.
+    # dies of the same coins (e.g. front and back die only used together) share one list and string
+    shared_coin_ids = {}
+    for n, n_dict in die_graph.nodes(data=True):
+        ids = tuple(n_dict["coin_ids"])
+        if ids not in shared_coin_ids:
+            shared_coin_ids[ids] = (n_dict["coin_ids"], "," + ",".join(ids) + ",")
+        n_dict["coin_ids"], n_dict["coin_ids_string"] = shared_coin_ids[ids]
 
     return die_graph, max_edge_weight
 
 
-def nx_to_elements(G):
+def cached_dies_graph(coin_graph, front_col, back_col, hidden_coins=None, hidden_dies=None, front_url_col=None, back_url_col=None):
     """
-    Convert NetworkX graph into dash cytoscape elements list
+    Same as create_dies_graph, but results are cached per loaded csv (nodes_key graph attribute), columns and hidden coins/dies.
+    The die-graph only depends on the coin nodes, so color, edge mode or view changes reuse the cached die-graph,
+    its cytoscape elements and its number of connected components.
+
+    Parameters
+    ----------
+    coin_graph : nx.Graph
+        NetworkX graph contains coin-graph structure.
+    front_col : str
+        String referencing the front-die attribute of a coin (node).
+    back_col : str
+        String referencing the back-die attribute of a coin (node).
+    hidden_coins : iterable of str or None
+        Coin ids, that are supposed to be skipped while creating the die-graph.
+    hidden_dies : iterable of str or None
+        Die ids, that are supposed to be skipped while creating the die-graph.
+    front_url_col : str or None
+        String referencing the front-die url attribute of a coin (node).
+    back_url_col : str or None
+        String referencing the back-die url attribute of a coin (node).
+
+    Returns
+    -------
+    nx.Graph
+        NetworkX graph contains die-graph structure, see create_dies_graph. Shared between callbacks, so it must not be modified.
+    int
+        maximum edge weight in die graph.
+    list of dict
+        Elements list of the die-graph for a dash cytoscape component. Shared between callbacks, so it must not be modified.
+    int
+        Number of connected components of the die-graph.
+    """
+
+    hidden_coins = frozenset(hidden_coins or ())
+    hidden_dies = frozenset(hidden_dies or ())
+    nodes_key = coin_graph.graph.get('nodes_key')
+    key = (nodes_key, front_col, back_col, hidden_coins, hidden_dies, front_url_col, back_url_col)
+    if nodes_key:
+        with _graph_cache_lock:
+            result = _dies_graph_cache.get(key)
+            if result is not None:
+                _dies_graph_cache.move_to_end(key)
+                return result
+
+    die_graph, max_edge_weight = create_dies_graph(coin_graph, front_col, back_col, hidden_coins, hidden_dies, front_url_col, back_url_col)
+    result = (die_graph, max_edge_weight, nx_to_elements(die_graph), count_connected_components(die_graph))
+    if nodes_key:
+        _cache_put(_dies_graph_cache, key, result)
+    return result
+
+
+def count_connected_components(G, nodes=None):
+    """
+    Counts connected components of a graph, optionally restricted to the subgraph induced by nodes.
+    Works directly on the adjacency dict with int indices and a visited bytearray, instead of nx graph views.
+
+    Parameters
+    ----------
+    G : nx.Graph
+        NetworkX graph representing either coin-graph or die-graph.
+    nodes : iterable or None
+        Nodes of the induced subgraph to count components in. If None all nodes of G are used.
+
+    Returns
+    -------
+    int
+        Number of connected components.
+    """
+
+    adj = G.adj
+    if nodes is None:
+        nodes = G.nodes
+    # contiguous index per node, neighbors outside of nodes are dropped
+    idx = {n: i for i, n in enumerate(nodes)}
+    neighbors = [[idx[v] for v in adj[n] if v in idx] for n in idx]
+    visited = bytearray(len(neighbors))
+
+    components = 0
+    for start in range(len(neighbors)):
+        if visited[start]:
+            continue
+        components += 1
+        # iterative search over whole component of start node
+        visited[start] = 1
+        stack = [start]
+        while stack:
+            for v in neighbors[stack.pop()]:
+                if not visited[v]:
+                    visited[v] = 1
+                    stack.append(v)
+    return components
+
+
+def cached_connected_components(G, hidden_nodes=None):
+    """
+    Counts connected components of a graph without hidden nodes, see count_connected_components.
+    Results are cached per stored graph (store_key graph attribute) and hidden nodes, so changes to colors
+    or the view don't search the graph again.
+
+    Parameters
+    ----------
+    G : nx.Graph
+        NetworkX graph representing either coin-graph or die-graph.
+    hidden_nodes : iterable or None
+        Nodes, that are left out of the count.
+
+    Returns
+    -------
+    int
+        Number of connected components.
+    """
+
+    hidden_nodes = frozenset(hidden_nodes or ())
+    store_key = G.graph.get('store_key')
+    key = (store_key, hidden_nodes)
+    if store_key:
+        with _graph_cache_lock:
+            components = _components_cache.get(key)
+            if components is not None:
+                _components_cache.move_to_end(key)
+                return components
+
+    nodes = [n for n in G.nodes if n not in hidden_nodes] if hidden_nodes else None
+    components = count_connected_components(G, nodes)
+    if store_key:
+        _cache_put(_components_cache, key, components)
+    return components
+
+
+def nodes_to_elements(G):
+    """
+    Convert nodes of NetworkX graph into dash cytoscape elements list
 
     Parameters
     ----------
     G : nx.Graph
         NetworkX graph representing either coin-graph or die-graph
-        
+
     Returns
     -------
     list of dict
-        List of dictionaries suitable for elements property of a dash cytoscape component.
+        List of node dictionaries suitable for elements property of a dash cytoscape component.
     """
 
     elements = []
     # add all nodes with attributes to elements
     for node_id, node_attributes in G.nodes(data=True):
-        node_data = {"id": str(node_id), "label": str(node_id),}
-        # add all other node attributes
-        for attribute_name, attribute_value in node_attributes.items():
-            node_data[str(attribute_name)] = attribute_value
+        node_id = str(node_id)
+        node_data = {"id": node_id, "label": node_id}
+        # add all other node attributes in one go, attribute names are already str
+        node_data.update(node_attributes)
         elements.append({"data": node_data})
+
+    return elements
+
+
+def edges_to_elements(G):
+    """
+    Convert edges of NetworkX graph into dash cytoscape elements list
+
+    Parameters
+    ----------
+    G : nx.Graph
+        NetworkX graph representing either coin-graph or die-graph
+
+    Returns
+    -------
+    list of dict
+        List of edge dictionaries suitable for elements property of a dash cytoscape component.
+    """
+
+    elements = []
     # add all edges with attributes to elements
     for u, v, edge_attributes in G.edges(data=True):
         edge_data = {'source': str(u), 'target': str(v)}
-        # add all other edge attributes
-        for attribute_name, attribute_value in edge_attributes.items():
-            edge_data[str(attribute_name)] = attribute_value
+        # add all other edge attributes in one go, attribute names are already str
+        edge_data.update(edge_attributes)
         elements.append({"data": edge_data})
 
     return elements
 
 
+def nx_to_elements(G):
+    """
+    Convert NetworkX graph into dash cytoscape elements list
+
+    Parameters
+    ----------
+    G : nx.Graph
+        NetworkX graph representing either coin-graph or die-graph
+        
+    Returns
+    -------
+    list of dict
+        List of dictionaries suitable for elements property of a dash cytoscape component.
+    """
+
+    return nodes_to_elements(G) + edges_to_elements(G)
+
+
+def graph_to_store_and_elements(G, node_elements=None):
+    """
+    Serialize graph for a dcc.Store, keeping the graph itself cached server side, and convert it into a dash cytoscape
+    elements list like nx_to_elements, going over nodes and edges only once.
+
+    Parameters
+    ----------
+    G : nx.Graph
+        NetworkX graph representing either coin-graph or die-graph.
+    node_elements : list of dict or None
+        Already converted node elements, e.g. from coin_node_elements. If None, nodes get converted like in nodes_to_elements.
+
+    Returns
+    -------
+    dict
+        Node-link data of the graph, suitable for a dcc.Store.
+    list of dict
+        List of dictionaries suitable for elements property of a dash cytoscape component.
+    """
+
+    _cache_graph(G)
+
+    store_nodes = []
+    elements = [] if node_elements is None else list(node_elements)
+    for node_id, node_attributes in G.nodes(data=True):
+        store_node = dict(node_attributes)
+        store_node["id"] = node_id
+        store_nodes.append(store_node)
+        if node_elements is None:
+            node_data = {"id": str(node_id), "label": str(node_id)}
+            node_data.update(node_attributes)
+            elements.append({"data": node_data})
+
+    store_links = []
+    for u, v, edge_attributes in G.edges(data=True):
+        link = dict(edge_attributes)
+        link['source'] = u
+        link['target'] = v
+        store_links.append(link)
+        edge_data = {'source': str(u), 'target': str(v)}
+        edge_data.update(edge_attributes)
+        elements.append({"data": edge_data})
+
+    # same layout as nx.readwrite.json_graph.node_link_data
+    store = {"directed": G.is_directed(), "multigraph": G.is_multigraph(), "graph": G.graph, "nodes": store_nodes, "links": store_links}
+    return store, elements
+
+
+def coin_node_elements(G, front_url_key, back_url_key):
+    """
+    Convert nodes of coin-graph into dash cytoscape elements list with background image attributes.
+    Nodes of a coin-graph do not change after loading the csv, only its edges do. So results are cached
+    per loaded csv (nodes_key graph attribute) and image columns.
+
+    Parameters
+    ----------
+    G : nx.Graph
+        NetworkX Graph containing coin-graph structure.
+    front_url_key : str
+        Normalized string containing front images column name.
+    back_url_key : str
+        Normalized string containing back images column name.
+
+    Returns
+    -------
+    list of dict
+        List of node dictionaries suitable for elements property of a dash cytoscape component,
+        with background image attributes. Shared between callbacks, so it must not be modified.
+    """
+
+    nodes_key = G.graph.get('nodes_key')
+    key = (nodes_key, front_url_key, back_url_key)
+    if nodes_key:
+        with _graph_cache_lock:
+            elements = _node_elements_cache.get(key)
+            if elements is not None:
+                _node_elements_cache.move_to_end(key)
+                return elements
+
+    elements = enrich_images(G, nodes_to_elements(G), front_url_key, back_url_key)
+    if nodes_key:
+        _cache_put(_node_elements_cache, key, elements)
+    return elements
+
+
+def attribute_index(G):
+    """
+    Build index from node attribute values to nodes, used for attribute based filtering.
+    Nodes of a coin-graph do not change after loading the csv, so results are cached per loaded csv (nodes_key graph attribute).
+
+    Parameters
+    ----------
+    G : nx.Graph
+        NetworkX Graph containing coin-graph structure.
+
+    Returns
+    -------
+    dict of str to dict of str to set
+        Mapping from attribute name to mapping from str(value) to set of node ids with that value.
+        Shared between callbacks, so it must not be modified.
+    """
+
+    nodes_key = G.graph.get('nodes_key')
+    if nodes_key:
+        with _graph_cache_lock:
+            index = _attribute_index_cache.get(nodes_key)
+            if index is not None:
+                _attribute_index_cache.move_to_end(nodes_key)
+                return index
+
+    index = defaultdict(lambda: defaultdict(set))
+    for node_id, node_dict in G.nodes(data=True):
+        for attribute, value in node_dict.items():
+            index[attribute][str(value)].add(node_id)
+    # plain dicts, so lookups of missing keys don't insert them
+    index = {attribute: dict(nodes_by_value) for attribute, nodes_by_value in index.items()}
+    if nodes_key:
+        _cache_put(_attribute_index_cache, nodes_key, index)
+    return index
+
+
 def cyto_elements_to_nx(elements, exclude_hidden):
     """
     Convert dash cytoscape elements list into NetworkX graph
@@ -214,39 +657,48 @@ def cyto_elements_to_nx(elements, exclude_hidden):
     """
 
     graph = nx.Graph()
-    # collect hidden nodes
+    # collect hidden nodes, identified by hidden node specific styling
     hidden_nodes = set()
     if exclude_hidden:
-        for ele in elements:
-            # check that element is node
-            if "data" in ele and "id" in ele["data"]:
-                # check for hidden node specific styling
-                if ele.get("style", {}).get("display") == "none":
-                    hidden_nodes.add(str(ele["data"]["id"]))
-
-    # add visible nodes and skip hidden nodes
-    for ele in elements:
-        data = ele.get("data", {})
-        # check that element is node
-        if "id" in data:
-            node_id = str(data["id"])
-            if node_id not in hidden_nodes:
-                graph.add_node(node_id)
-    
-    # add edges
-    for ele in elements:
-        data = ele.get("data", {})
-        if "source" in data and "target" in data:
-            u = str(data["source"])
-            v = str(data["target"])
-            # skip if one node of edge is hidden
-            if u in hidden_nodes or v in hidden_nodes:
-                continue
-            graph.add_edge(u, v)
+        hidden_nodes = {
+            str(ele["data"]["id"]) for ele in elements
+            if "data" in ele and "id" in ele["data"] and ele.get("style", {}).get("display") == "none"
+        }
+
+    element_data = [ele.get("data", {}) for ele in elements]
+    # add visible nodes in one batch and skip hidden nodes
+    node_ids = (str(data["id"]) for data in element_data if "id" in data)
+    graph.add_nodes_from(node_id for node_id in node_ids if node_id not in hidden_nodes)
+
+    # add edges in one batch, skip if one node of edge is hidden
+    edges = ((str(data["source"]), str(data["target"])) for data in element_data if "source" in data and "target" in data)
+    graph.add_edges_from((u, v) for u, v in edges if u not in hidden_nodes and v not in hidden_nodes)
 
     return graph
 
 
+# same coin images are enriched again on every new csv upload
+@lru_cache(maxsize=8192)
+def _split_url(front_url, back_url):
+    """
+    Build url of merged front/back preview image. Also it caches function results.
+
+    Parameters
+    ----------
+    front_url : str
+        Background url of front image.
+    back_url : str
+        Background url of back image.
+
+    Returns
+    -------
+    str
+        Url of /merge_split route, same query string as urlencode with fixed size.
+    """
+
+    return _SPLIT_URL.format(front=quote_plus(front_url), back=quote_plus(back_url))
+
+
 def enrich_images(G, base_elements, front_url_key, back_url_key):
     """
     Adds bg_* attributes to elements list, that will be used for adding background images to nodes.
@@ -266,35 +718,32 @@ def enrich_images(G, base_elements, front_url_key, back_url_key):
     -------
     list of dict
         List of dictionaries suitable for elements property of a dash cytoscape component, with background image attributes.
+        The elements of base_elements are modified in place and returned.
     """
 
-    # build dict: node_id ->(front_url, back_url)
-    url_by_id = {}
+    # build dict: node_id -> bg_* fields, only for nodes that have images
+    bg_by_id = {}
     for n_id, n_dict in G.nodes(data=True):
         front_url = bg_url_from_csv_value(n_dict.get(front_url_key))
         back_url = bg_url_from_csv_value(n_dict.get(back_url_key))
-        url_by_id[str(n_id)] = (front_url, back_url)
-
-    # Enrich base elements with bg_* fields
-    enriched = []
-    for ele in base_elements:
-        if not isinstance(ele, dict) or 'data' not in ele or 'id' not in ele['data']:
-            enriched.append(ele)
+        if not (front_url or back_url):
             continue
-
-        ele_id = str(ele['data']['id'])
-        front_url, back_url = url_by_id.get(ele_id, (None, None))
-
-        new_data = dict(ele['data'])
+        bg = {}
         if front_url:
-            new_data['bg_front'] = front_url
+            bg['bg_front'] = front_url
         if back_url:
-            new_data['bg_back'] = back_url
+            bg['bg_back'] = back_url
         if front_url and back_url:
             # Optional merged preview for edge-mode == 'both'
-            params = {'w': 200, 'h': 200, 'front': front_url, 'back': back_url}
-            new_data['bg_split'] = f"/merge_split?{urlencode(params)}"
+            bg['bg_split'] = _split_url(front_url, back_url)
+        bg_by_id[str(n_id)] = bg
 
-        enriched.append({'data': new_data})
+    # Enrich base elements with bg_* fields, elements are freshly built so no copy is needed
+    for ele in base_elements:
+        if not isinstance(ele, dict) or 'data' not in ele or 'id' not in ele['data']:
+            continue
+        bg = bg_by_id.get(str(ele['data']['id']))
+        if bg:
+            ele['data'].update(bg)
 
-    return enriched
\ No newline at end of file
+    return base_elements
@@ -1,3 +1,7 @@
+# all layouts selectable in the layout-selector dropdown
+LAYOUT_NAMES = ('cose', 'cose-bilkent', 'dagre', 'klay', 'grid', 'circle', 'concentric')
+
+
 def build_layout(name):
     """
     Builds a layout configuration dictionary.
@@ -11,11 +11,13 @@ from proxy import register_image_proxy
 from create_view_callbacks import register_create_view_callbacks
 from update_view_callbacks import register_update_view_callbacks
 from ui_elements_callbacks import register_ui_elements_callbacks
+from layouts import LAYOUT_NAMES, build_layout
 
 
 cyto.load_extra_layouts()
 
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
+# compress responses (Flask-Compress), element lists and graph stores of large csv files are big json payloads
+app = dash.Dash(__name__, suppress_callback_exceptions=True, compress=True)
 
 # Get the Flask server instance
 server = app.server
@@ -29,10 +31,13 @@ app.layout = html.Div([
     dcc.Store(id='graph-store-dies'),
     dcc.Store(id='filter-values-store', data={}),
     dcc.Store(id='custom-colors-store', data=[]),
+    dcc.Store(id='combinations-store', data=[]),  # sorted list of all attribute=value strings of coins, for color dropdowns
     dcc.Store(id='layout-choices', data={'coins': 'dagre', 'dies': 'dagre'}),
+    dcc.Store(id='layout-configs', data={name: build_layout(name) for name in LAYOUT_NAMES}),  # layout configuration per layout name, used clientside
     dcc.Store(id='pending-csv', data=None),
     dcc.Store(id='csv-approved', data=None),
     dcc.Store(id="hidden-store", data={"coins": [], "dies": []}), # stores list of coin ids(str), list of dies(obj with id and typ)
+    dcc.Store(id='stylesheet-hashes', data={}),  # hash of the stylesheet shown per view, so unchanged stylesheets are not sent again
     dcc.Store(id="upload-signal", data=0),
     dcc.Upload(id="upload-data", style={"display": "none"}),
 
@@ -227,15 +232,7 @@ app.layout = html.Div([
             html.Label("Layout-Type"),
             dcc.Dropdown(
                 id='layout-selector',
-                options=[
-                    {'label': 'cose', 'value': 'cose'},
-                    {'label': 'cose-bilkent', 'value': 'cose-bilkent'},
-                    {'label': 'dagre', 'value': 'dagre'},
-                    {'label': 'klay', 'value': 'klay'},
-                    {'label': 'grid', 'value': 'grid'},
-                    {'label': 'circle', 'value': 'circle'},
-                    {'label': 'concentric', 'value': 'concentric'},
-                ],
+                options=[{'label': name, 'value': name} for name in LAYOUT_NAMES],
                 value='dagre',
                 clearable=False,
                 style={'marginBottom': '10px'}
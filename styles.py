@@ -2,12 +2,15 @@
 Helpers for bulding dash cytoscape stylesheets.
 """
 
+from functools import lru_cache
+
 # stylesheet generation
 _css_esc = str.maketrans({"\\": r"\\\\", '"': r"\\\"", "'": r"\\'", "]": r"\\]", "[": r"\\["})
-# make string safe to embed inside cytoscape attribute selector
+# make string safe to embed inside cytoscape attribute selector, same ids and values get escaped on every stylesheet update
+@lru_cache(maxsize=2048)
 def css_escape(s):
     """
-    Escape a string for safe use inside cytoscape attribute selectors.
+    Escape a string for safe use inside cytoscape attribute selectors. Also it caches function results.
 
     Parameters
     ----------
@@ -22,6 +25,40 @@ def css_escape(s):
 
     return str(s).translate(_css_esc)
 
+# base stylesheet of the die-view, identical on every stylesheet update. Tuple, so it can't be extended by accident
+_DIES_STYLESHEET = (
+    {'selector': 'node', 'style': {'label': 'data(label)'}},
+    {
+        'selector': 'edge',
+        'style': {
+            'label': 'data(weight)',
+            'font-size': 12,
+            'min-zoomed-font-size': 8,
+            'text-rotation': 'autorotate',
+            'line-color': 'black',
+            'text-margin-y': -15,
+            'width': 2,
+            'border-color': 'black'
+        }
+    },
+    {
+        'selector': 'node[bg_die]', # nur wenn es eine bg_die gibt
+        'style': {
+            'background-image': 'data(bg_die)',
+            'background-fit': 'cover',
+            'background-opacity': 1,
+            'width': 200,
+            'height': 200,
+            'border-width': 4,
+            'text-background-color': '#ffffff',
+            'text-background-opacity': 0.5,
+            'text-background-shape': 'round-rectangle'
+        }
+    },
+    {'selector': ':selected', 'style': {'border-width': 8, "background-color": "#999"}},     # change styling of node selection
+)
+
+
 def base_stylesheet_dies(scale_edges_weight=False, max_edge_weight = 0):
     """
     Build the cytoscape base stylesheet for the die-view.
@@ -39,50 +76,75 @@ def base_stylesheet_dies(scale_edges_weight=False, max_edge_weight = 0):
     Returns
     -------
     list of dict
-        List of cytoscape stylesheet rule dictionaries for the die-view.
+        New list of cytoscape stylesheet rule dictionaries for the die-view, so rules can be appended.
+        The rule dictionaries are shared between callbacks, so they must not be modified.
     """
 
-    stylesheet = [
-        {'selector': 'node', 'style': {'label': 'data(label)'}},
-        {
-            'selector': 'edge',
-            'style': {
-                'label': 'data(weight)',
-                'font-size': 12,
-                'min-zoomed-font-size': 8,
-                'text-rotation': 'autorotate',
-                'line-color': 'black',
-                'text-margin-y': -15,
-                'width': 2,
-                'border-color': 'black'
-            }
-        },
-        {
-            'selector': 'node[bg_die]', # nur wenn es eine bg_die gibt
-            'style': {
-                'background-image': 'data(bg_die)',
-                'background-fit': 'cover',
-                'background-opacity': 1,
-                'width': 200,
-                'height': 200,
-                'border-width': 4,
-                'text-background-color': '#ffffff',
-                'text-background-opacity': 0.5,
-                'text-background-shape': 'round-rectangle'
-            }
-        },
-        {'selector': ':selected', 'style': {'border-width': 8, "background-color": "#999"}},     # change styling of node selection
-    ]
-
     if scale_edges_weight:
-        stylesheet.append({
+        return [*_DIES_STYLESHEET, {
             'selector': 'edge',
             'style': {
                 'width': f'mapData(weight, 0, {max_edge_weight}, 1, 20)'
             }
-        })
+        }]
+
+    return list(_DIES_STYLESHEET)
 
-    return stylesheet
+
+def _img_rule(key):
+    """
+    Build stylesheet rule, that uses a node attribute as background image.
+
+    Parameters
+    ----------
+    key : str
+        Node attribute containing the image url.
+
+    Returns
+    -------
+    dict
+        Cytoscape stylesheet rule dictionary.
+    """
+
+    return {
+        'selector': f'node[{key}]',
+        'style': {
+            'background-image': f'data({key})',
+            'background-fit': 'cover',   # keep full coin visible
+            'background-clip': 'node',
+            'background-opacity': 1,
+        }
+    }
+
+
+# base stylesheet of the coin-view without image rules
+_COINS_STYLESHEET = (
+    {'selector': 'node', 'style': {'label': 'data(label)', 'width': 200, 'height': 200,'border-width': 4, 'border-color': 'black'}},
+    {
+        'selector': 'edge',
+        'style': {
+            'label': 'data(label)',
+            'font-size': 12,
+            'min-zoomed-font-size': 8,
+            'text-rotation': 'autorotate',
+            'line-color': 'black',
+            'text-margin-y': -10,
+            'width': 2,
+        }
+    },
+    {'selector': ':selected', 'style': {'border-width': 8, "background-color": "#999"}},     # change styling of node selection
+)
+# base stylesheets of the coin-view for every edge mode
+_COINS_STYLESHEETS = {
+    'front': _COINS_STYLESHEET + (_img_rule('bg_front'),),
+    'back': _COINS_STYLESHEET + (_img_rule('bg_back'),),
+    # mode == 'both': lowest → highest priority (later wins)
+    'both': _COINS_STYLESHEET + (
+        _img_rule('bg_back'),   # fallback 2
+        _img_rule('bg_front'),  # fallback 1
+        _img_rule('bg_split'),  # preferred
+    ),
+}
 
 
 def base_stylesheet_coins(edge_mode='front'):
@@ -100,49 +162,33 @@ def base_stylesheet_coins(edge_mode='front'):
     Returns
     -------
     list of dict
-        List of cytoscape stylesheet rule dictionaries for the coin-view.
+        New list of cytoscape stylesheet rule dictionaries for the coin-view, so rules can be appended.
+        The rule dictionaries are shared between callbacks, so they must not be modified.
     """
 
-    styles = [
-        {'selector': 'node', 'style': {'label': 'data(label)', 'width': 200, 'height': 200,'border-width': 4, 'border-color': 'black'}},
-        {
-            'selector': 'edge',
-            'style': {
-                'label': 'data(label)',
-                'font-size': 12,
-                'min-zoomed-font-size': 8,
-                'text-rotation': 'autorotate',
-                'line-color': 'black',
-                'text-margin-y': -10,
-                'width': 2,
-            }
-        },
-        {'selector': ':selected', 'style': {'border-width': 8, "background-color": "#999"}},     # change styling of node selection
-    ]
+    return list(_COINS_STYLESHEETS.get(edge_mode, _COINS_STYLESHEETS['both']))
 
-    def _img_rule(key: str):
-        return {
-            'selector': f'node[{key}]',
-            'style': {
-                'background-image': f'data({key})',
-                'background-fit': 'cover',   # keep full coin visible
-                'background-clip': 'node',
-                'background-opacity': 1,
-            }
-        }
 
-    if edge_mode == 'front':
-        styles.append(_img_rule('bg_front'))
+# hiding rules for the same coins, dies and attribute values are rebuilt on every stylesheet update
+@lru_cache(maxsize=4096)
+def _hide_rule(attr, value):
+    """
+    Build stylesheet rule, that hides nodes with given attribute value. Also it caches function results.
+
+    Parameters
+    ----------
+    attr : str
+        Node attribute name, already safe for selectors.
+    value : str
+        Attribute value of nodes to hide.
 
-    elif edge_mode == 'back':
-        styles.append(_img_rule('bg_back'))
-    else:
-        # mode == 'both': lowest → highest priority (later wins)
-        styles.append(_img_rule('bg_back'))   # fallback 2
-        styles.append(_img_rule('bg_front'))  # fallback 1
-        styles.append(_img_rule('bg_split'))  # preferred
+    Returns
+    -------
+    dict
+        Cytoscape stylesheet rule dictionary. Shared between callbacks, so it must not be modified.
+    """
 
-    return styles
+    return {'selector': f"node[{attr}='{css_escape(value)}']", 'style': {'display': 'none'}}
 
 
 def set_hiding_rules(filter_store, skip_coins, skip_dies):
@@ -153,8 +199,9 @@ def set_hiding_rules(filter_store, skip_coins, skip_dies):
     ----------
     filter_store : dict or None
         Contains mapping from attribute name to list of values.
-    skip_coins : list of str or None
-        List of strings, where every str is the coin_id of a coin. These are supposed to be skipped while creating the die-graph.
+    skip_coins : iterable of str
+        Coin ids of coins, that are supposed to be hidden. Rules are built in sorted order, so the stylesheet
+        does not depend on set iteration order.
     skip_dies : list of dict or None
         List of die dictionaries, where every die dictionary represents a die with keys id and typ.
         These are supposed to be skipped while creating the die-graph.
@@ -168,25 +215,54 @@ def set_hiding_rules(filter_store, skip_coins, skip_dies):
     hiding_rules = []
 
     # hide nodes based on selection
-    for node_id in skip_coins:
-        hiding_rules.append({'selector': f"node[id='{css_escape(node_id)}']", 'style': {'display': 'none'}})
+    for node_id in sorted(skip_coins):
+        hiding_rules.append(_hide_rule('id', node_id))
     for die in skip_dies:
         die_id = die.get("id")
         die_typ = die.get("typ")
-        hiding_rules.append({'selector': f"node[{css_escape(die_typ)}='{css_escape(die_id)}']", 'style': {'display': 'none'}})
+        hiding_rules.append(_hide_rule(css_escape(die_typ), die_id))
 
     # hide nodes based on attributes
     if isinstance(filter_store, dict):
         for attr, values in filter_store.items():
             for val in values or []:
-                hiding_rules.append({
-                    'selector': f"node[{attr}='{css_escape(val)}']",
-                    'style': {'display': 'none'}
-                })
+                hiding_rules.append(_hide_rule(attr, val))
 
     return hiding_rules
 
 
+# same color selections are rebuilt on every stylesheet update
+@lru_cache(maxsize=1024)
+def _color_rule(conditions, color):
+    """
+    Build stylesheet rule, that colors the border of nodes matching all conditions. Also it caches function results.
+
+    Parameters
+    ----------
+    conditions : tuple of str
+        Condition strings looking like attr=value, other entries are ignored.
+    color : str
+        Color name or hex code of the border.
+
+    Returns
+    -------
+    dict
+        Cytoscape stylesheet rule dictionary. Shared between callbacks, so it must not be modified.
+    """
+
+    selector_parts = ['node']
+    # build up attribute selector by adding each attribute=value pair
+    for condition in conditions:
+        if isinstance(condition, str) and '=' in condition:
+            # split up attribute value pairs
+            attr, val = condition.split('=', 1)
+            selector_parts.append(f"[{attr}='{css_escape(val)}']")
+    return {
+        'selector': ''.join(selector_parts),
+        'style': {'border-color': color,}
+    }
+
+
 def set_color_rules(color_values_list, color_ids):
     """
     Helper to build cytoscape stylesheet rules for coloring specific nodes
@@ -216,17 +292,6 @@ def set_color_rules(color_values_list, color_ids):
         color = id_.get('index') if isinstance(id_, dict) else None
         if not color or not color_values:
             continue
+        color_rules.append(_color_rule(tuple(color_values), color))
 
-        selector = 'node'
-        # build up attribute selector by adding each attribute=value pair
-        for condition in color_values:
-            if isinstance(condition, str) and '=' in condition:
-                # split up attribute value pairs
-                attr, val = condition.split('=', 1)
-                selector += f"[{attr}='{css_escape(val)}']"
-        color_rules.append({
-            'selector': selector,
-            'style': {'border-color': color,}
-        })
-
-    return color_rules
\ No newline at end of file
+    return color_rules
@@ -2,8 +2,7 @@
 This module handles all callbacks that are relevant the UI elements, except the cytoscape instances.
 """
 
-from dash import Input, Output, State, ctx, no_update, dcc, html
-import networkx as nx
+from dash import Input, Output, State, ClientsideFunction, ctx, no_update, dcc, html
 from uuid import uuid4
 
 
@@ -107,11 +106,9 @@ def register_ui_elements_callbacks(app):
     @app.callback(
         Output('custom-color-dropdowns', 'children'),
         Input('custom-colors-store', 'data'),
-        Input('graph-store-coins', 'data'),
-        Input('graph-store-dies', 'data'),
-        State('graph-view-selector', 'value')
+        Input('combinations-store', 'data'),
     )
-    def render_custom_color_dropdowns(colors, coins_data, dies_data, view):
+    def render_custom_color_dropdowns(colors, combinations):
         """
         Render dropdowns for every custom color.
 
@@ -119,34 +116,18 @@ def register_ui_elements_callbacks(app):
         ----------
         colors : list of str or None
             List of custom colors stored in custom-colors-store.
-        coins_data : dict or None
-            Stores graph, node and edge attributes from coins.
-        dies_data : dict or None
-            Stores graph, node and edge attributes from dies.
-        view : str
-            Currently selected view from the graph view selector.
+        combinations : list of str or None
+            Sorted attribute=value combinations of all coins, built on csv upload.
 
         Returns
         -------
         list of dash.html.Div
             A list of containers, each holding a label and a dropdown for a custom color.
         """
-        # no custom colors chosen
-        if not colors:
-            return []
-        # use graph data of currently active view
-        graph_data = coins_data if view == 'coins' else dies_data
-        if not graph_data:
+        # no custom colors chosen or no csv loaded yet
+        if not colors or not combinations:
             return []
-        # reconstruct NetworkX graph from stored graph data
-        G = nx.readwrite.json_graph.node_link_graph(graph_data)
-        # collect all attribute:value combinations from nodes
-        combinations = set()
-        for _, data in G.nodes(data=True):
-            for k, v in data.items():
-                if v is not None:
-                    combinations.add(f"{k}={v}")
-        options = [{'label': c, 'value': c} for c in sorted(combinations)]
+        options = [{'label': c, 'value': c} for c in combinations]
         # create one dropdown for every custom color
         return [
             html.Div([
@@ -259,54 +240,13 @@ def register_ui_elements_callbacks(app):
         return style, [img]
 
 
-    @app.callback(
+    # runs in the browser on every hover, see displayNodeData in assets/clientside.js
+    app.clientside_callback(
+        ClientsideFunction(namespace='clientside', function_name='displayNodeData'),
         Output('node-info-box', 'children'),
         Input('cy-coins', 'mouseoverNodeData'),
         Input('cy-dies', 'mouseoverNodeData')
     )
-    def display_node_data(data_coin, data_die):
-        """
-        Update node-info-box when hovering over nodes.
-
-        Parameters
-        ----------
-        data_coin : dict or None
-            Node data for hovered over node in coin view.
-        data_die : dict or None
-            Node data for hovered over node in die view.
-
-        Returns
-        -------
-        dash.html.Div or str
-            A component showing the node label and a list of attributes or user instructions.
-        """
-
-        # Use whichever view triggered callback
-        trig = ctx.triggered_id
-        if trig == 'cy-dies':
-            data = data_die
-        elif trig == 'cy-coins':
-            data = data_coin
-        else:
-            data = data_die or data_coin
-
-        if not data:
-            return "Hover over a node to see details"
-
-        label = data.get('label', 'untitled')
-        # only show attributes in the csv
-        skip_keys = {'id', 'label', 'bg_front', 'bg_back', 'bg_split', 'timeStamp', 'bg_die', 'coin_ids_string'}
-        # build list of node attributes
-        items = []
-        for k, v in data.items():
-            if k in skip_keys:
-                continue
-            items.append(html.Li([html.Strong(f"{k}: "), str(v)]))
-        # display node label + list of node attributes
-        return html.Div([
-            html.H4(f"Node: {label}"),
-            html.Ul(items, style={'margin': 0, 'paddingLeft': '18px'})
-        ])
 
 
     @app.callback(
@@ -341,54 +281,15 @@ def register_ui_elements_callbacks(app):
             return True
 
 
-    @app.callback(
+    # png export only hands a fixed configuration to cytoscape, see exportPng in assets/clientside.js
+    app.clientside_callback(
+        ClientsideFunction(namespace='clientside', function_name='exportPng'),
         Output('cy-coins', 'generateImage'),
         Output('cy-dies', 'generateImage'),
         Input('export-png-button', 'n_clicks'),
         State('graph-view-selector', 'value'),
         prevent_initial_call=True
     )
-    def export_png(n_clicks, view):
-        """
-        Triggers PNG export of the current view.
-
-        Parameters
-        ----------
-        n_clicks : int or None
-            Number of clicks on the export button.
-        view : str
-            Currently selected view from the graph view selector.
-
-        Returns
-        -------
-        dict or dash.no_update
-            A generateImage configuration dict for coin cytoscape instance if the coin view is active.
-        dict or dash.no_update
-            A generateImage configuration dict for die cytoscape instance if the die view is active.
-        """
-
-        if view == 'dies':
-            return no_update, {
-                'type': 'png',
-                'action': 'download',
-                'filename': 'diesgraph_view',
-                'options': {          
-                'full': False,
-                'scale': 4,
-                'bg': 'white',
-            }
-            }
-        else:
-            return {
-                'type': 'png',
-                'action': 'download',
-                'filename': 'coingraph_view',
-                'options': {          
-                'full': False,
-                'scale': 4,
-                'bg': 'white',
-            }
-            }, no_update
 
 
     @app.callback(
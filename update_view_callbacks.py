@@ -3,15 +3,57 @@ This module handles all callbacks, that are relevant for updating the cytoscape
 edge rebuilding, filtering, coloring and layout changes for both coin- and die-view.
 """
 
-from dash import Input, Output, State, ctx, no_update, ALL, dcc, html
+from dash import Input, Output, State, ClientsideFunction, ctx, no_update, ALL, dcc, html
+import hashlib
+import json
 import networkx as nx
 
-from csv_handler import normalize_key
-from graph_handler import remove_duplicate_dies, add_edges_by_mode, create_dies_graph, nx_to_elements, enrich_images
-from layouts import build_layout
+from csv_handler import resolve_column_keys
+from graph_handler import (remove_duplicate_dies, add_edges_by_mode, cached_dies_graph,
+                           coin_node_elements, graph_to_store_and_elements, graph_from_store, cached_connected_components,
+                           attribute_index)
 from styles import base_stylesheet_coins, base_stylesheet_dies, set_hiding_rules, set_color_rules
 
 
+# triggers of update_styles_and_stats, that change the die-graph. All other triggers only restyle it
+_STRUCTURAL_TRIGGERS = frozenset({'show-only-selection-button', 'hide-selection-button', 'reset-selection-button', 'filter-values-store'})
+
+
+def _skip_unchanged_stylesheets(stylesheets, previous_hashes):
+    """
+    Replace stylesheets, that are the same as the ones already shown, with no_update. So cytoscape doesn't restyle
+    the whole graph, when e.g. only the stats changed. Hashes are computed from the json of a stylesheet,
+    so they are the same in every worker process.
+
+    Parameters
+    ----------
+    stylesheets : dict of str to list of dict
+        New stylesheet per view, 'coins' or 'dies'.
+    previous_hashes : dict or None
+        Hash of the stylesheet currently shown per view, from stylesheet-hashes store.
+
+    Returns
+    -------
+    dict of str to list of dict or no_update
+        Stylesheet per view, no_update if it did not change.
+    dict or no_update
+        Updated hash per view for stylesheet-hashes store, no_update if no stylesheet changed.
+    """
+
+    hashes = dict(previous_hashes or {})
+    changed = {}
+    for view, stylesheet in stylesheets.items():
+        digest = hashlib.blake2b(json.dumps(stylesheet, sort_keys=True).encode(), digest_size=16).hexdigest()
+        if hashes.get(view) == digest:
+            changed[view] = no_update
+        else:
+            changed[view] = stylesheet
+            hashes[view] = digest
+    if all(stylesheet is no_update for stylesheet in changed.values()):
+        return changed, no_update
+    return changed, hashes
+
+
 def register_update_view_callbacks(app):
     """
     Register all dash callbacks relevant to updating the cytoscape instances to the app.
@@ -63,23 +105,19 @@ def register_update_view_callbacks(app):
         if not graph_data_coins:
             return no_update, no_update
 
-        # Load the stored graph
-        G = nx.readwrite.json_graph.node_link_graph(graph_data_coins)
-        # Remove all existing edges and rebuild according to radio selection
-        G.remove_edges_from(G.edges())
+        # Load the stored graph and copy it without edges, since cached graph is shared and edges get rebuilt anyway
+        G = nx.create_empty_copy(graph_from_store(graph_data_coins))
 
-        front_key = normalize_key(front_column or "front die")
-        back_key = normalize_key(back_column or "back die")
-        front_url_key = normalize_key(front_url_column or "front img")
-        back_url_key = normalize_key(back_url_column or "back img")
+        front_key, back_key, front_url_key, back_url_key = resolve_column_keys(
+            front_column, back_column, front_url_column, back_url_column)
 
         add_edges_by_mode(G, front_key, back_key, edge_mode)
 
-        # convert to elements
-        coins_base_elements = nx_to_elements(G)
-        coins_with_images_elements = enrich_images(G, coins_base_elements, front_url_key, back_url_key)
+        # convert to store data and elements, only edges changed so node elements come from cache
+        coins_store, coins_with_images_elements = graph_to_store_and_elements(
+            G, coin_node_elements(G, front_url_key, back_url_key))
 
-        return nx.readwrite.json_graph.node_link_data(G), coins_with_images_elements
+        return coins_store, coins_with_images_elements
 
 
     @app.callback(
@@ -167,6 +205,7 @@ def register_update_view_callbacks(app):
         Output('stats-box', 'children'),
         Output('cy-dies', 'elements', allow_duplicate=True),
         Output('hidden-store', 'data'),
+        Output('stylesheet-hashes', 'data'),
         Input('upload-new-csv', 'n_clicks'),
         Input('show-only-selection-button', 'n_clicks'),
         Input('hide-selection-button', 'n_clicks'),
@@ -187,12 +226,13 @@ def register_update_view_callbacks(app):
         State('cy-dies', 'selectedNodeData'),
         State('hidden-store', 'data'),
         State('cy-dies', 'elements'),   
+        State('stylesheet-hashes', 'data'),
         prevent_initial_call=True
     )
     def update_styles_and_stats(upload_new_csv_click, show_click, hide_click, unhide_click, view, color_values_list, filter_store,
                                 edge_mode, scale_weighted_edges, color_ids, graph_data_coins, graph_data_dies,
                                 front_column, back_column, front_url_column, back_url_column, selected_nodes_coins,
-                                selected_nodes_dies, hidden, dies_elements_current):
+                                selected_nodes_dies, hidden, dies_elements_current, stylesheet_hashes):
         """
         Update die elementslist, coin- and die-stylsheet, statistics and hidden stores.
         This callback triggers upon any selection button, view change, changes in the dropdown's, changing edge options.
@@ -240,42 +280,53 @@ def register_update_view_callbacks(app):
             Previously stored hidden coin and die information.
         dies_elements_current : list of dict or None
             Current elementlist from die cytoscape instance.
+        stylesheet_hashes : dict or None
+            Hash of the stylesheet currently shown per view.
 
         Returns
         -------
         list of dict
-            Stylesheet for the coin cytoscape instance.
+            Stylesheet for the coin cytoscape instance, no_update if it did not change.
         list of dict
-            Stylesheet for the die cytoscape instance.
+            Stylesheet for the die cytoscape instance, no_update if it did not change.
         dash.html.Div
             Children for the stats box, containing statistics.
         list of dict
-            Elementlist from die cytoscape instance after updating.
+            Elementlist from die cytoscape instance after updating, no_update if trigger did not change the die-graph.
         dict
             Updated stored hidden coin and die information.
+        dict
+            Updated hash of the stylesheet shown per view.
         """
         # if no coin graph exists yet, nothing can be updated
         if not graph_data_coins:
-            return no_update, no_update, no_update, no_update, no_update
+            return no_update, no_update, no_update, no_update, no_update, no_update
         if ctx.triggered_id == "upload-new-csv":
-            return no_update, no_update, no_update, no_update, {"coins": [], "dies": []}
-        # rebuild networkX graph from stored graph structure
-        coin_graph_full = nx.readwrite.json_graph.node_link_graph(graph_data_coins)
+            return no_update, no_update, no_update, no_update, {"coins": [], "dies": []}, no_update
+        # only the coin-view base stylesheet depends on the edge mode, keep colors and hidden nodes from the stores
+        if ctx.triggered_id == "edge-mode":
+            hidden_store = hidden or {}
+            color_rules = set_color_rules(color_values_list, color_ids)
+            hiding_rules = set_hiding_rules(filter_store, set(hidden_store.get("coins", [])), hidden_store.get("dies", []))
+            stylesheets, hashes_out = _skip_unchanged_stylesheets(
+                {'coins': base_stylesheet_coins(edge_mode) + color_rules + hiding_rules}, stylesheet_hashes)
+            return stylesheets['coins'], no_update, no_update, no_update, no_update, hashes_out
+        # get networkX graph of stored graph structure
+        coin_graph_full = graph_from_store(graph_data_coins)
         # prepare column names
-        front_key = normalize_key(front_column or "front die")
-        back_key = normalize_key(back_column or "back die")
-        front_url_key = normalize_key(front_url_column or "front img")
-        back_url_key = normalize_key(back_url_column or "back img")
+        front_key, back_key, front_url_key, back_url_key = resolve_column_keys(
+            front_column, back_column, front_url_column, back_url_column)
 
         # apply attribute based filter to coin graph
         hide_nodes_by_attr = set()
         if filter_store:
+            # look up nodes per selected value instead of scanning all nodes
+            index = attribute_index(coin_graph_full)
             for attr, values in filter_store.items():
-                for node_id, node_data in coin_graph_full.nodes(data=True):
-                    if attr in node_data and str(node_data[attr]) in values:
-                        hide_nodes_by_attr.add(node_id)
+                nodes_by_value = index.get(attr, {})
+                for value in values or []:
+                    hide_nodes_by_attr.update(nodes_by_value.get(str(value), ()))
         visible_coins = [node_id for node_id in coin_graph_full.nodes if node_id not in hide_nodes_by_attr]
-        coin_graph_filtered = coin_graph_full.subgraph(visible_coins).copy()
         
         # get stored hidden coin ids and dies
         hidden_store = hidden or {}
@@ -291,40 +342,34 @@ def register_update_view_callbacks(app):
         elif ctx.triggered_id == "hide-selection-button":
             # add current selection of current view to hidden store
             if view == 'coins':
-                selection_ids = [str(d["id"]) for d in (selected_nodes_coins or []) if isinstance(d, dict) and "id" in d]
+                selection_ids = [str(d["id"]) for d in (selected_nodes_coins or []) if "id" in d]
                 all_hidden_coins_ids = set(hidden_store_coins + selection_ids) #make to list?
                 all_hidden_dies_objs = hidden_store_dies
             else: 
-                selection_dies = [{"id": str(d["id"]), "typ": d.get("typ")} for d in (selected_nodes_dies or [])if isinstance(d, dict) and "id" in d]
+                selection_dies = [{"id": str(d["id"]), "typ": d.get("typ")} for d in (selected_nodes_dies or []) if "id" in d]
                 all_hidden_dies_objs = remove_duplicate_dies(hidden_store_dies + selection_dies)
                 all_hidden_coins_ids = set(hidden_store_coins) #make to list?
         # Case 3: "Show only Selection" was clicked -> extend hidden stores with everything but the current selection
         elif ctx.triggered_id == "show-only-selection-button":
             if view == 'coins':
                 # nodes currently visible after attribute-based filter
-                visible_coin_ids = {str(n) for n in coin_graph_filtered.nodes}
-                selection_ids = {str(d["id"]) for d in (selected_nodes_coins or []) if isinstance(d, dict) and "id" in d}
+                visible_coin_ids = {str(n) for n in visible_coins}
+                selection_ids = {str(d["id"]) for d in (selected_nodes_coins or []) if "id" in d}
                 not_selected_coins = visible_coin_ids - selection_ids
                 # set union of store and not selected coins
                 all_hidden_coins_ids = set(hidden_store_coins) | not_selected_coins
                 all_hidden_dies_objs = hidden_store_dies
             else:
                 # get die ids from current selection
-                visible_die_ids = {
-                    str(el.get("data", {}).get("id")) 
-                    for el in (dies_elements_current or [])
-                        if "id" in el.get("data", {})   # check if element is node
-                    }
-                selection_ids = {str(d["id"]) for d in (selected_nodes_dies or []) if isinstance(d, dict) and "id" in d}
-                not_selected_dies_ids = visible_die_ids - selection_ids
-                # convert to dies obj with id and typ
+                selection_ids = {str(d["id"]) for d in (selected_nodes_dies or []) if "id" in d}
+                # build die objects with id and typ for all visible, not selected dies in one pass, these now should be hidden
                 new_hidden_dies_obj = []
-                # build die objects for all not selected dies, that now should be hidden
                 for el in (dies_elements_current or []):
-                    if "id" in el.get("data", {}):
-                        data = el.get("data", {})
-                        node_id = str(data.get("id"))
-                        if node_id in not_selected_dies_ids:
+                    data = el.get("data", {})
+                    # check if element is node
+                    if "id" in data:
+                        node_id = str(data["id"])
+                        if node_id not in selection_ids:
                             new_hidden_dies_obj.append({"id": node_id, "typ": data.get("typ")})
                 all_hidden_dies_objs = remove_duplicate_dies(hidden_store_dies + new_hidden_dies_obj)
                 all_hidden_coins_ids = set(hidden_store_coins)
@@ -333,9 +378,11 @@ def register_update_view_callbacks(app):
             all_hidden_coins_ids = set(hidden_store_coins)
             all_hidden_dies_objs = hidden_store_dies
         
-        # rebuild die-graph without hidden coins/dies (attribute based filtering + selection based)
+        # die-graph without hidden coins/dies (attribute based filtering + selection based), only rebuilt if these changed
         all_hidden_dies_ids = [d["id"] for d in all_hidden_dies_objs]
-        updated_die_graph, biggest_edge_weight = create_dies_graph(coin_graph_filtered, front_key, back_key, all_hidden_coins_ids, all_hidden_dies_ids, front_url_key, back_url_key)
+        updated_die_graph, biggest_edge_weight, dies_elements, die_components = cached_dies_graph(
+            coin_graph_full, front_key, back_key, hide_nodes_by_attr | all_hidden_coins_ids, all_hidden_dies_ids,
+            front_url_key, back_url_key)
 
         # build stylesheet rules for both views
         color_rules = set_color_rules(color_values_list, color_ids)
@@ -348,12 +395,12 @@ def register_update_view_callbacks(app):
             stylesheet_dies = base_stylesheet_dies(False) + color_rules + hiding_rules
 
         # compute stats
-        count_coins = coin_graph_filtered.number_of_nodes() - len(all_hidden_coins_ids)
+        count_coins = len(visible_coins) - len(all_hidden_coins_ids)
         count_dies = updated_die_graph.number_of_nodes()
         if view == 'coins':
-            components = nx.number_connected_components(coin_graph_filtered) if count_coins else 0
+            components = cached_connected_components(coin_graph_full, hide_nodes_by_attr) if count_coins else 0
         else:
-            components = nx.number_connected_components(updated_die_graph) if count_dies else 0
+            components = die_components
 
         def _stats_list(items):
             return html.Ul([html.Li(it) for it in items], style={'margin': 0, 'paddingLeft': '18px'})
@@ -379,53 +426,25 @@ def register_update_view_callbacks(app):
             "dies": [],
             }
 
-        return stylesheet_coins, stylesheet_dies, stats_children, nx_to_elements(updated_die_graph), hidden_out
+        # only filtering and hiding change the die-graph, other triggers just restyle it
+        if ctx.triggered_id not in _STRUCTURAL_TRIGGERS:
+            dies_elements = no_update
 
+        # only send stylesheets, that changed
+        stylesheets, hashes_out = _skip_unchanged_stylesheets(
+            {'coins': stylesheet_coins, 'dies': stylesheet_dies}, stylesheet_hashes)
 
-    @app.callback(
+        return stylesheets['coins'], stylesheets['dies'], stats_children, dies_elements, hidden_out, hashes_out
+
+
+    # layout changes only look up the layout configuration, see setLayout in assets/clientside.js
+    app.clientside_callback(
+        ClientsideFunction(namespace='clientside', function_name='setLayout'),
         Output('cy-coins', 'layout'),
         Output('cy-dies', 'layout'),
         Input('layout-selector', 'value'),
         State('graph-view-selector', 'value'),
         State('auto-layout-toggle', 'value'),
+        State('layout-configs', 'data'),
         prevent_initial_call=True
     )
-    def set_layout(selected_layout, active_view, auto_layout_toggle):
-        """
-        Set the layout of the coin and die cytoscape instances.
-
-        Parameters
-        ----------
-        selected_layout : str
-            String contains requested layout from layout-selector ui component.
-        active_view : str
-            Currently selected view from the graph view selector.
-        auto_layout_toggle : list
-            List contains 'on' if checklist is clicked, else empty.
-
-        Returns
-        -------
-        dict 
-            Layout configuration for the coin cytoscape instance
-        dict
-            Layout configuration for the die cytoscape instance.
-        """
-
-        auto_enabled = 'on' in (auto_layout_toggle or [])
-        layout = build_layout(selected_layout)
-
-        # If auto-layout is off, only change layout on layout-selector
-        if not auto_enabled:
-            if ctx.triggered_id == 'layout-selector':
-                        if active_view == 'coins':
-                            return layout, no_update
-                        elif active_view == 'dies':
-                            return no_update, layout
-            else:
-                return no_update, no_update
-        
-        # Apply layout only to the currently active view
-        if active_view == 'coins':
-            return layout, no_update
-        else:
-            return no_update, layout
\ No newline at end of file